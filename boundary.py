@@ -1,18 +1,12 @@
-from enum import Enum
-import functools
-import itertools
+from collections import namedtuple
+from enum import IntEnum
+import numpy as np
 import operator
 
 
-class Vect:
-    """2D vector"""
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-
-
-    def __hash__(self):
-        return hash((self.x, self.y))
+class Vect(namedtuple('Vect', ('x', 'y'))):
+    """2D vector. A named tuple, so that hashing, equality and ordering go through the C-level tuple methods"""
+    __slots__ = ()
 
 
     def __repr__(self):
@@ -27,18 +21,6 @@ class Vect:
         return Vect(self.x - other.x, self.y - other.y)
 
 
-    def __eq__(self, other):
-        return self.x == other.x and self.y == other.y
-
-
-    def __ne__(self, other):
-        return not self.__eq__(other)
-
-
-    def __lt__(self, other):
-        return self.cmp_key() < other.cmp_key()
-
-
     def mult(self, m):
         return Vect(m * self.x, m * self.y)
 
@@ -51,29 +33,50 @@ class Vect:
         return abs(self.x) + abs(self.y)
 
 
+    # Rotation matrices (a, b, c, d) for r in [0..3], applied as (a*x + b*y, c*x + d*y)
+    _ROT_TABLE = ((1, 0, 0, 1), (0, -1, 1, 0), (-1, 0, 0, -1), (0, 1, -1, 0))
+
+
     def rotate(self, r):
-        rmod = r % 4
-        if rmod == 0:
-            return Vect(self.x, self.y)
-        elif rmod == 1:
-            return Vect(-self.y, self.x)
-        elif rmod == 2:
-            return Vect(-self.x, -self.y)
-        else:   # rmod == 3
-            return Vect(self.y, -self.x)
+        (a, b, c, d) = Vect._ROT_TABLE[r & 3]
+        x = a * self.x + b * self.y
+        y = c * self.x + d * self.y
+        if -1 <= x <= 1 and -1 <= y <= 1:
+            return _UNIT_VECTS[(x, y)]
+        return Vect(x, y)
+
+
+    @classmethod
+    def unit(cls, dx, dy):
+        return _UNIT_VECTS[(dx, dy)]
 
 
     def cmp_key(self):
         return (self.x, self.y)
 
 
-class Orientation(Enum):
+# Interned instances of the 9 vectors with coordinates in {-1, 0, 1}, to cut allocations
+# in the boundary construction paths
+_UNIT_VECTS = {(dx, dy): Vect(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)}
+
+
+def _pack_points(xy):
+    # Pack (x, y) int32 coordinates into a single int64 key per point
+    return (xy[:, 0].astype(np.int64) << 32) | (xy[:, 1].astype(np.int64) & 0xFFFFFFFF)
+
+
+def _signed_area_2x(xs, ys):
+    # Twice the signed area of the closed polyline (shoelace formula), in one vectorized pass
+    return int((xs * np.roll(ys, -1) - ys * np.roll(xs, -1)).sum())
+
+
+class Orientation(IntEnum):
     CLOCKWISE = 0
     COUNTERCLOCKWISE = 1
     UNDEFINED = 2
 
 
-class Domain(Enum):
+class Domain(IntEnum):
     INTERIOR = 0
     EXTERIOR = 1
 
@@ -101,9 +104,19 @@ class CompareLabels:
 
 
 class Boundary:
+    """A closed polyline on the grid. Points are stored as a (N, 2) numpy array (SoA layout), labels as a plain list"""
     def __init__(self):
-        self.points = []
+        self._xy = np.empty((0, 2), dtype = np.int32)
         self.labels = []
+        self._n = 0
+        self._edges = None          # Lazily computed, invalidated on mutation
+        self._bbox = None           # Lazily computed, invalidated on mutation
+        self._point_index = None    # Lazily computed, invalidated on mutation
+
+
+    @property
+    def points(self):
+        return [Vect(int(x), int(y)) for (x, y) in self._xy]
 
 
     def __repr__(self):
@@ -111,14 +124,21 @@ class Boundary:
 
 
     def __len__(self):
-        assert len(self.points) == len(self.labels)
-        return len(self.points)
+        return self._n
+
+
+    def _check(self):
+        assert self._xy.shape[0] == len(self.labels) == self._n
 
 
     def append(self, vect, label = None):
         assert isinstance(vect, Vect)
-        self.points.append(vect)
+        self._xy = np.append(self._xy, np.array([[vect.x, vect.y]], dtype = np.int32), axis = 0)
         self.labels.append(label)
+        self._n += 1
+        self._edges = None
+        self._bbox = None
+        self._point_index = None
 
 
     def set_labels(self, labels):
@@ -126,67 +146,87 @@ class Boundary:
         self.labels = labels
 
 
-    def __append(self, other):
-        self.points += other.points
-        self.labels += other.labels
-
-
     def __replace(self, other):
-        self.points = other.points
+        self._xy = other._xy
         self.labels = other.labels
+        self._n = other._n
+        self._edges = other._edges
+        self._bbox = other._bbox
+        self._point_index = other._point_index
 
 
     def copy(self):
         other = Boundary()
-        other.points = self.points.copy()
+        other._xy = self._xy.copy()
         other.labels = self.labels.copy()
-        return other
-
-
-    def __slice(self, i, j):
-        imod = i % len(self)
-        jmod = j % len(self)
-        other = Boundary()
-        if imod <= jmod:
-            other.points = self.points[imod:jmod]
-            other.labels = self.labels[imod:jmod]
-        else:
-            other.points = self.points[imod:] + self.points[:jmod]
-            other.labels = self.labels[imod:] + self.labels[:jmod]
+        other._n = self._n
+        other._edges = self._edges
+        other._bbox = self._bbox
+        other._point_index = self._point_index      # Never mutated once built, safe to share
         return other
 
 
     def get_point(self, idx):
-        current = idx % len(self)
-        return self.points[current]
+        current = idx % self._n
+        return Vect(int(self._xy[current, 0]), int(self._xy[current, 1]))
 
 
     def get_label(self, idx):
-        current = idx % len(self)
+        current = idx % self._n
         return self.labels[current]
 
 
+    def get_bbox(self):
+        if self._bbox is None:
+            xs = self._xy[:, 0]
+            ys = self._xy[:, 1]
+            self._bbox = (int(xs.min()), int(xs.max()), int(ys.min()), int(ys.max()))
+        return self._bbox
+
+
+    def get_edges(self):
+        if self._edges is None:
+            self._edges = np.roll(self._xy, -1, axis = 0) - self._xy
+        return self._edges
+
+
+    def get_point_index(self):
+        """Dict from packed point coordinates to index, reused across all the queries between two mutations"""
+        if self._point_index is None:
+            self._point_index = dict((key, i) for (i, key) in enumerate(_pack_points(self._xy).tolist()))
+        return self._point_index
+
+
     def get_edge(self, idx):
-        current = idx % len(self)
-        next = (idx + 1) % len(self)
-        return self.points[next] - self.points[current]
+        edge = self.get_edges()[idx % self._n]
+        return Vect(int(edge[0]), int(edge[1]))
+
+
+    @staticmethod
+    def __vect_list(arr):
+        return [Vect(x, y) for (x, y) in arr.tolist()]
 
 
     def iter_all(self, starting_idx = 0):
-        imod = starting_idx % len(self)
-        for idx in itertools.chain(range(imod, len(self)), range(0, imod)):
-            yield (self.get_point(idx), self.get_edge(idx), self.get_label(idx))
+        imod = starting_idx % self._n
+        points = Boundary.__vect_list(self._xy)
+        edges = Boundary.__vect_list(self.get_edges())
+        labels = self.labels
+        return zip(points[imod:] + points[:imod], edges[imod:] + edges[:imod], labels[imod:] + labels[:imod])
 
 
     def iter_slice(self, i, j):
-        imod = i % len(self)
-        jmod = j % len(self)
+        n = self._n
+        imod = i % n
+        jmod = j % n
         if imod <= jmod:
-            range_indices = range(imod, jmod)
+            indices = np.arange(imod, jmod)
         else:
-            range_indices = range(imod, jmod + len(self))
-        for idx in range_indices:
-            yield (self.get_point(idx), self.get_edge(idx), self.get_label(idx))
+            indices = np.concatenate((np.arange(imod, n), np.arange(0, jmod)))
+        points = Boundary.__vect_list(self._xy[indices])
+        edges = Boundary.__vect_list(self.get_edges()[indices])
+        labels = [self.labels[idx] for idx in indices]
+        return zip(points, edges, labels)
 
 
     @staticmethod
@@ -205,11 +245,7 @@ class Boundary:
 
 
     def orientation(self):
-        def cumul_cross_z(cumul_tuple, edge):
-            (sum, prev_edge) = cumul_tuple
-            return (sum + prev_edge.cross_z(edge), edge)
-
-        sum_cross_z, _ = functools.reduce(cumul_cross_z, (self.get_edge(idx) for idx in range(len(self))), (0, self.get_edge(-1)))
+        sum_cross_z = _signed_area_2x(self._xy[:, 0], self._xy[:, 1])
         if sum_cross_z > 0:
             return Orientation.COUNTERCLOCKWISE
         elif sum_cross_z < 0:
@@ -218,8 +254,15 @@ class Boundary:
             return Orientation.UNDEFINED
 
 
+    def has_label(self, label, i, L):
+        """Whether the given label appears among the L edge labels starting at index i (with wraparound)"""
+        n = self._n
+        labels = self.labels
+        return any(labels[(i + k) % n] == label for k in range(L))
+
+
     def is_unique_points(self):
-        return len(set(self.points)) == len(self.points)
+        return np.unique(_pack_points(self._xy)).size == self._n
 
 
     def common_segments(self, other):
@@ -237,35 +280,71 @@ class Boundary:
         assert other.is_unique_points()
         # assert self.orientation() == other.orientation()
 
+        # The boundaries cannot share a point if their bounding boxes do not overlap
+        (s_xmin, s_xmax, s_ymin, s_ymax) = self.get_bbox()
+        (o_xmin, o_xmax, o_ymin, o_ymax) = other.get_bbox()
+        if s_xmax < o_xmin or o_xmax < s_xmin or s_ymax < o_ymin or o_ymax < s_ymin:
+            return []
+
+        # Tile-sized queries go through the cached point index: a handful of dict probes
+        # instead of a set intersection against the whole boundary
+        if other._n <= 8:
+            return self.__common_segments_indexed(self.get_point_index(), other)
+
         # Identify common points and their respective indices. Those are considered "segments of length 0".
-        self_points = dict((p, i) for (i, p) in enumerate(self.points))
-        other_points = dict((p, i) for (i, p) in enumerate(other.points))
-        common_points = set(self_points.keys()) & set(other_points.keys())
-        common_segments_length_0 = sorted([(self_points[p], other_points[p], 0) for p in common_points])
-
-        # Merge into actual segments
-        def recurse_join_segments(remaining_length_0, cumul_segments = []):
-            if len(remaining_length_0) == 0:
-                return cumul_segments
-            (prev_i, prev_j, _) = remaining_length_0[0]
-            L = 0
-            seg_index = 1
-            while seg_index < len(remaining_length_0):
-                (i, j, _) = remaining_length_0[seg_index]
-                L += 1
-                seg_index += 1
-                if i != prev_i + L or j != (prev_j - L) % len(other_points):
-                    L = L - 1
-                    break
-            cumul_segments.append((prev_i, (prev_j - L) % len(other_points), L))
-            return recurse_join_segments(remaining_length_0[L+1:], cumul_segments)
-        common_segments = recurse_join_segments(common_segments_length_0)
+        # The intersection is computed on int64 packed coordinates, in a single pass over contiguous buffers
+        keys_self = _pack_points(self._xy)
+        keys_other = _pack_points(other._xy)
+        _, idx_self, idx_other = np.intersect1d(keys_self, keys_other, assume_unique = True, return_indices = True)
+        order = np.argsort(idx_self)
+        return self.__join_segments(idx_self[order], idx_other[order], len(other))
+
+
+    def common_segments_batch(self, others):
+        """
+        Common segments between this boundary and several (typically tile-sized) boundaries.
+
+        Equivalent to calling common_segments on each of them, except the point index of this
+        boundary is built once and shared by all the queries.
+        """
+        (s_xmin, s_xmax, s_ymin, s_ymax) = self.get_bbox()
+        point_index = self.get_point_index()
+        results = []
+        for other in others:
+            (o_xmin, o_xmax, o_ymin, o_ymax) = other.get_bbox()
+            if s_xmax < o_xmin or o_xmax < s_xmin or s_ymax < o_ymin or o_ymax < s_ymin:
+                results.append([])
+                continue
+            results.append(self.__common_segments_indexed(point_index, other))
+        return results
+
+
+    def __common_segments_indexed(self, point_index, other):
+        pairs = [(point_index[key], j) for (j, key) in enumerate(_pack_points(other._xy).tolist()) if key in point_index]
+        pairs.sort()
+        i_arr = np.fromiter((i for (i, _) in pairs), dtype = np.int64, count = len(pairs))
+        j_arr = np.fromiter((j for (_, j) in pairs), dtype = np.int64, count = len(pairs))
+        return self.__join_segments(i_arr, j_arr, len(other))
+
+
+    def __join_segments(self, i_arr, j_arr, M):
+        # Merge sorted (i, j) index pairs of common points into actual segments, in a single forward pass.
+        # A run of common points extends as long as 'i' increments and 'j' decrements (modulo M)
+        common_segments = []
+        if i_arr.size > 0:
+            breaks = (i_arr[1:] != i_arr[:-1] + 1) | (j_arr[1:] != (j_arr[:-1] - 1) % M)
+            bounds = np.flatnonzero(breaks) + 1
+            starts = np.concatenate(([0], bounds))
+            ends = np.concatenate((bounds, [i_arr.size]))
+            for (start, end) in zip(starts, ends):
+                L = int(end - start) - 1
+                common_segments.append((int(i_arr[start]), (int(j_arr[start]) - L) % M, L))
 
         # Deal with the index rollover on 'i' (we might want to join the first and last segments)
         if len(common_segments) >= 2:
             (i_first, j_first, L_first) = common_segments[0]
             (i_last, j_last, L_last) = common_segments[-1]
-            if i_first == 0 and i_last + L_last == len(self_points) - 1 and (j_last - j_first) % len(other_points) == L_first + 1:
+            if i_first == 0 and i_last + L_last == len(self) - 1 and (j_last - j_first) % M == L_first + 1:
                 common_segments = common_segments[1:]
                 common_segments[-1] = (i_last, j_first, L_first + L_last + 1)
 
@@ -278,13 +357,22 @@ class Boundary:
         assert L > 0
         assert L < len(self)
         assert L < len(other)
-        self_labels = self.__slice(i, i + L).labels
-        self_labels.reverse()
-        for r in range(len(other)):
-            other_labels = other.__slice(j - r, j - r + L).labels
-            assert len(other_labels) == len(self_labels)
-            if all(cmp(*args) for args in zip(self_labels, other_labels)):
-                yield r
+        n = self._n
+        self_labels_rev = [self.labels[(i + k) % n] for k in range(L)]
+        self_labels_rev.reverse()
+        M = len(other)
+        other_labels = other.labels
+        if cmp is CompareLabels.treat_none_as_regular_label:
+            # Fast path for the default comparator: one C-level list comparison per rotation
+            doubled = other_labels + other_labels
+            for r in range(M):
+                start = (j - r) % M
+                if doubled[start:start + L] == self_labels_rev:
+                    yield r
+        else:
+            for r in range(M):
+                if all(cmp(self_labels_rev[k], other_labels[(j - r + k) % M]) for k in range(L)):
+                    yield r
 
 
     def merge(self, other, hint_common_segment = None):
@@ -302,23 +390,84 @@ class Boundary:
             assert L > 0
             assert L < len(self)
             assert L < len(other)
-            merged = Boundary()
-            merged.__append(other.__slice(j + L, j))
-            merged.__append(self.__slice(i + L, i))
-            assert len(merged) + 2 * L == len(self) + len(other)
-            self.__replace(merged)
+            n_s = self._n
+            n_o = other._n
+            i0 = (i + L) % n_s
+            j0 = (j + L) % n_o
+            # Splice the complement of the common segment in 'other' followed by its complement
+            # in 'self', with a single array concatenation and a single label list build
+            if j0 <= j:
+                xy_parts = [other._xy[j0:j]]
+                labels = other.labels[j0:j]
+            else:
+                xy_parts = [other._xy[j0:], other._xy[:j]]
+                labels = other.labels[j0:] + other.labels[:j]
+            if i0 <= i:
+                xy_parts.append(self._xy[i0:i])
+                labels += self.labels[i0:i]
+            else:
+                xy_parts.extend((self._xy[i0:], self._xy[:i]))
+                labels += self.labels[i0:] + self.labels[:i]
+            assert len(labels) + 2 * L == n_s + n_o
+            self._xy = np.concatenate(xy_parts)
+            self.labels = labels
+            self._n = len(labels)
+            self._edges = None
+            self._bbox = None
+            self._point_index = None
         return self
 
 
+    def translated(self, vect):
+        """A copy of this boundary translated by the given vector. The edges are shared (invariant under translation)"""
+        assert isinstance(vect, Vect)
+        other = Boundary()
+        other._xy = self._xy + np.array((vect.x, vect.y), dtype = np.int32)
+        other.labels = self.labels.copy()
+        other._n = self._n
+        other._edges = self._edges
+        if self._bbox is not None:
+            (xmin, xmax, ymin, ymax) = self._bbox
+            other._bbox = (xmin + vect.x, xmax + vect.x, ymin + vect.y, ymax + vect.y)
+        return other
+
+
     def bottom_left(self):
-        min_pt = min(self.points, key=Vect.cmp_key)
-        return Vect(min_pt.x, min_pt.y)
+        idx = np.lexsort((self._xy[:, 1], self._xy[:, 0]))[0]
+        return Vect(int(self._xy[idx, 0]), int(self._xy[idx, 1]))
 
 
     def rotate_to_start_with(self, point):
-        idx = self.points.index(point)
-        self.points = self.points[idx:] + self.points[:idx]
+        matches = np.flatnonzero((self._xy == (point.x, point.y)).all(axis = 1))
+        if matches.size == 0:
+            raise ValueError('{} is not in the boundary'.format(point))
+        idx = int(matches[0])
+        self._xy = np.roll(self._xy, -idx, axis = 0)
         self.labels = self.labels[idx:] + self.labels[:idx]
+        self._edges = None
+        self._point_index = None
+
+
+def _build_from_edge_offsets():
+    # Precompute the 4 corner offsets of the unit square for each (orientation, domain, unit edge)
+    offsets = {}
+    for orientation in Orientation:
+        r = 1 if orientation == Orientation.COUNTERCLOCKWISE else -1
+        for domain in Domain:
+            for edge in [Vect.unit(1, 0), Vect.unit(0, 1), Vect.unit(-1, 0), Vect.unit(0, -1)]:
+                current_point = Vect.unit(0, 0)
+                current_dir = edge if domain == Domain.INTERIOR else edge.rotate(-r)
+                corners = []
+                for _ in range(4):
+                    corners.append((current_point.x, current_point.y))
+                    current_point = current_point + current_dir
+                    current_dir = current_dir.rotate(r)
+                offsets[(orientation, domain, (edge.x, edge.y))] = np.array(corners, dtype = np.int32)
+    return offsets
+
+
+_FROM_EDGE_OFFSETS = _build_from_edge_offsets()
+_TILE_OFFSETS = np.array([(0, 0), (1, 0), (1, 1), (0, 1)], dtype = np.int32)
 
 
 def from_edge(point, edge, orientation, domain):
@@ -327,13 +476,9 @@ def from_edge(point, edge, orientation, domain):
     assert isinstance(orientation, Orientation)
     assert isinstance(domain, Domain)
     border = Boundary()
-    current_point = point
-    r = 1 if orientation == Orientation.COUNTERCLOCKWISE else -1
-    current_dir = edge if domain == Domain.INTERIOR else edge.rotate(-r)
-    for i in range(4):
-        border.append(current_point)
-        current_point = current_point + current_dir
-        current_dir = current_dir.rotate(r)
+    border._xy = _FROM_EDGE_OFFSETS[(orientation, domain, (edge.x, edge.y))] + np.array((point.x, point.y), dtype = np.int32)
+    border.labels = [None, None, None, None]
+    border._n = 4
     return border
 
 
@@ -342,6 +487,7 @@ def get_tile(bottom_left, desc = [None, None, None, None]):
     assert isinstance(bottom_left, Vect)
     assert len(desc) == 4
     border = Boundary()
-    for idx, delta in enumerate([Vect(0, 0), Vect(1, 0), Vect(1, 1), Vect(0, 1)]):
-        border.append(bottom_left + delta, desc[idx])
+    border._xy = _TILE_OFFSETS + np.array((bottom_left.x, bottom_left.y), dtype = np.int32)
+    border.labels = list(desc)
+    border._n = 4
     return border
@@ -2,7 +2,9 @@
 
 
 import argparse
+import bisect
 import boundary
+import concurrent.futures
 import functools
 import graphics
 import itertools
@@ -18,7 +20,6 @@ from boundary import Boundary
 from boundary import Domain
 from boundary import Orientation
 from boundary import Vect
-from collections import deque
 from enum import Enum, auto
 
 
@@ -62,37 +63,48 @@ def handle_assertion_error():
 
 class Tile:
     """A tile (usually a game tile) defined by the description of its four sides (desc), its cardinality (max_nb) and optionally a graphical representation (img)"""
-    def __init__(self, desc = [None, None, None, None], max_nb = 1, img_path = '', tags = []):
-        self.desc = desc
+    __slots__ = ('desc', 'max_nb', 'img_path', 'img', 'tags', 'river_label_count', '_rotated_descs')
+
+
+    def __init__(self, desc = (None, None, None, None), max_nb = 1, img_path = '', tags = ()):
+        self.desc = tuple(desc)
         self.max_nb = max_nb
         self.img_path = img_path
         self.img = None
-        self.tags = tags
+        self.tags = frozenset(tags)         # O(1) membership tests in the tile predicates
+        self.river_label_count = self.desc.count('R')
+        self._rotated_descs = None
 
 
     def __repr__(self):
+        # JSON-loaded descriptions are four single chars: print them joined, as before the tuple conversion
+        if all(isinstance(side, str) and len(side) == 1 for side in self.desc):
+            return 'Tile({})'.format(''.join(self.desc))
         return 'Tile({})'.format(self.desc)
 
 
+    def rotated_desc(self, r):
+        """The tile description rotated by r quarter turns (same convention as deque.rotate), cached on the tile"""
+        if self._rotated_descs is None:
+            desc = self.desc
+            self._rotated_descs = tuple(desc[-k:] + desc[:-k] for k in range(4))
+        return self._rotated_descs[r % 4]
+
+
     @classmethod
     def from_json_description(cls, json_obj, basedir):
-        assert 'description' in json_obj.keys()
+        assert 'description' in json_obj
         desc = json_obj['description']
-        max_nb = json_obj['cardinality'] if 'cardinality' in json_obj.keys() else 1
-        img_path = os.path.join(basedir, json_obj['img']) if 'img' in json_obj.keys() and json_obj['img'] else ''
-        tags = []
-        for id in range(10):
-            key = 'tag' + str(id)
-            if key in json_obj.keys():
-                tags.append(json_obj[key])
+        max_nb = json_obj['cardinality'] if 'cardinality' in json_obj else 1
+        img_path = os.path.join(basedir, json_obj['img']) if 'img' in json_obj and json_obj['img'] else ''
+        tags = [value for (key, value) in json_obj.items() if key.startswith('tag')]
         return cls(desc, max_nb, img_path, tags)
 
 
     @classmethod
     def from_uniform_color(cls, color, size, tag = ''):
-        tile = cls()
+        tile = cls(tags = (tag,))
         tile.img = graphics.draw_uniform_tile(color, size)
-        tile.tags.append(tag)
         assert tile.get_size() == size
         return tile
 
@@ -125,7 +137,7 @@ def parse_tileset_description_file(json_file):
     try:
         fp = open(json_file, 'r')
         tileset_json = json.load(fp)
-        assert 'tiles' in tileset_json.keys()
+        assert 'tiles' in tileset_json
         for tile_json in tileset_json['tiles']:
             tile = Tile.from_json_description(tile_json, os.path.dirname(json_file))
             assert tile.max_nb >= 0
@@ -148,12 +160,26 @@ def parse_tileset_description_file(json_file):
         print('Loaded {} tiles from file {}'.format(cumul, json_file))
 
 
+def deduplicate_tileset(tileset):
+    """Merge tiles with identical description, image path and tags into a single Tile with the summed cardinality, so all the per-tile caches are shared"""
+    canonical = {}
+    for tile in tileset:
+        key = (tile.desc, tile.img_path, tile.tags)
+        if key in canonical:
+            canonical[key].max_nb += tile.max_nb
+        else:
+            canonical[key] = tile
+    return list(canonical.values())
+
+
 def load_or_draw_tile_images(tileset, draw_all = False):
     assert graphics.is_init()
     tile_size = 0
     if not draw_all:
+        # The image loads are I/O bound and pygame releases the GIL while decoding
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            list(executor.map(Tile.load_image, tileset))
         for tile in tileset:
-            tile.load_image()
             if tile.get_size() != 0:
                 if tile_size == 0:
                     tile_size = tile.get_size()
@@ -170,6 +196,9 @@ def load_or_draw_tile_images(tileset, draw_all = False):
 
 class PositionedTile:
     """Declare a position on the grid where a tile could be placed"""
+    __slots__ = ('pos', 'segment', 'segment_length', 'l1_distance')
+
+
     def __init__(self, pos, segments = []):
         assert isinstance(pos, Vect)
         self.pos = pos
@@ -177,6 +206,9 @@ class PositionedTile:
             self.segment = segments[0]  # Common segment between the current map boundary and this tile
         else:
             self.segment = None         # Use None if unknown, or to indicate a forbidden position
+        # Precomputed: read many times per construction (sort keys, deletion criteria)
+        self.segment_length = self.segment[2] if self.segment is not None else 0
+        self.l1_distance = pos.l1_distance()
 
 
     @classmethod
@@ -190,12 +222,27 @@ class PositionedTile:
         return cls(pos, border.common_segments(tile_border))
 
 
+    @classmethod
+    def batch_from_boundary_edges(cls, border, edges, domain = Domain.EXTERIOR):
+        """Positioned tiles adjacent to the given (point, edge) pairs, with their common segments computed in one batched query against the boundary"""
+        assert isinstance(border, Boundary)
+        positions = []
+        tile_borders = []
+        for (point, edge) in edges:
+            tile_border = boundary.from_edge(point, edge, Orientation.COUNTERCLOCKWISE, domain)
+            pos = tile_border.bottom_left()
+            tile_border.rotate_to_start_with(pos)
+            positions.append(pos)
+            tile_borders.append(tile_border)
+        return [cls(pos, segments) for (pos, segments) in zip(positions, border.common_segments_batch(tile_borders))]
+
+
     def __repr__(self):
         return 'PositionedTile(pos = {}, segment = {})'.format(self.pos, self.segment)
 
 
     def get_l1_distance(self):
-        return self.pos.l1_distance()
+        return self.l1_distance
 
 
     def get_segment(self):
@@ -203,8 +250,7 @@ class PositionedTile:
 
 
     def get_segment_length(self):
-        (_, _, L) = self.get_segment()
-        return L
+        return self.segment_length
 
 
     def iter_segment(self):
@@ -227,11 +273,15 @@ class PositionedTile:
 
 class PlacedTile(PositionedTile):
     """Declares a Tile placed on the grid, with its position and orientation (r)"""
+    __slots__ = ('tile', 'r', 'cached_boundary')
+
+
     def __init__(self, tile, pos, r, segment = None):
         assert isinstance(tile, Tile)
         PositionedTile.__init__(self, pos, [] if segment is None else [segment])
         self.tile = tile
         self.r = r
+        self.cached_boundary = None     # The boundary is immutable once placed (pos and r never change)
 
 
     @override
@@ -246,6 +296,13 @@ class PlacedTile(PositionedTile):
         return cls(tile, pos_tile.pos, r, pos_tile.segment)
 
 
+    def segment_has_label(self, label):
+        """Whether the given label appears on the segment in contact with the map boundary, without building the tile boundary"""
+        (_, j, L) = self.get_segment()
+        desc = self.tile.rotated_desc(self.r)
+        return any(desc[(j + k) % 4] == label for k in range(L))
+
+
     def draw(self, display):
         assert isinstance(display, graphics.GridDisplay)
         assert self.tile.img is not None
@@ -254,9 +311,9 @@ class PlacedTile(PositionedTile):
 
     @override
     def get_boundary(self):
-        desc = deque(self.tile.desc)
-        desc.rotate(self.r)
-        return PositionedTile.get_boundary(self, desc)
+        if self.cached_boundary is None:
+            self.cached_boundary = PositionedTile.get_boundary(self, self.tile.rotated_desc(self.r))
+        return self.cached_boundary
 
 
 class CompositeTile:
@@ -274,6 +331,7 @@ class CompositeTile:
 
     def __init__(self):
         self.elts = []
+        self.sorted = True
 
 
     def append(self, tile):
@@ -284,12 +342,15 @@ class CompositeTile:
                 offset = Vect(int(result.group(1)), int(result.group(2)))
         if offset:
             self.elts.append(CompositeTile.Elt(tile, offset))
+            self.sorted = False
         else:
             warn('Could not find the offset pattern in the tags for tile {}. Tags = {}.'.format(tile, tile.tags))
 
 
     def __reduce(self, fun, initializer = None):
-        self.elts.sort(key=operator.attrgetter('offset'))
+        if not self.sorted:
+            self.elts.sort(key=operator.attrgetter('offset'))
+            self.sorted = True
         return functools.reduce(fun, self.elts, initializer)
 
 
@@ -322,13 +383,16 @@ class TileSubset:
 
 
     def partition_iter(self, tileset_iter):
-        it0, it1 = itertools.tee(tileset_iter)
-        selection = list(filter(self.predicate, it0))
+        # Single pass: evaluate the predicate once per tile (no itertools.tee buffering)
+        selection = []
+        remaining = []
+        for tile in tileset_iter:
+            (selection if self.predicate(tile) else remaining).append(tile)
         if self.shuffle:
-            selection = random.sample(selection, len(selection))
+            random.shuffle(selection)
         if self.output_n >= 0:
             selection = selection[:self.output_n]
-        return selection, itertools.filterfalse(self.predicate, it1)
+        return selection, iter(remaining)
 
 
     def partition(self, tileset_iter):
@@ -367,7 +431,7 @@ class TileSubset:
     @staticmethod
     def river_exclude_t_shaped():
         def pred_river_t_shaped(tile):
-            return 'river' in tile.tags and list(tile.desc).count('R') == 3
+            return 'river' in tile.tags and tile.river_label_count == 3
         return TileSubset(pred_river_t_shaped, output_n = 0)
 
 
@@ -430,7 +494,7 @@ def iterate_tilesets(river_tileset, regular_tileset, river_tileset_period = 0, i
 
 def shuffle_tileset(tileset, first_tileset_flag, river_placement_policies = []):
     river_flag = any('river' in tile.tags for tile in tileset)
-    all_tiles = itertools.chain.from_iterable(itertools.repeat(tile, tile.max_nb) for tile in tileset)
+    all_tiles = itertools.chain.from_iterable([tile] * tile.max_nb for tile in tileset)
     if river_flag:
         river_long = RiverPlacement.LONG_RIVER in river_placement_policies
         river_exclude_t_shaped = RiverPlacement.EXCLUDE_T in river_placement_policies
@@ -471,14 +535,25 @@ def shuffle_tileset(tileset, first_tileset_flag, river_placement_policies = []):
 
 
 class CandidateTiles:
-    def __init__(self, on_update = None, on_delete = None):
+    def __init__(self, on_update = None, on_delete = None, sort_key = None):
         assert not on_update or callable(on_update)
         assert not on_delete or callable(on_delete)
+        assert not sort_key or callable(sort_key)
         self.sorted_positions = []          # List of positions
+        self.positions_set = set()          # Same content as sorted_positions, for O(1) membership tests
         self.tiles = dict()                 # Dict of position -> PositionedTile
         self.nb_to_be_deleted = 0
         self.on_update = on_update
         self.on_delete = on_delete
+        self.sort_key = sort_key            # When set, sorted_positions is kept in key order incrementally and the sort methods are not needed
+        self.sort_keys = dict()             # Position -> key of the entry in sorted_positions (only used with sort_key)
+        self.sorted_keys = []               # Keys aligned with sorted_positions, bisected directly (only used with sort_key)
+
+
+    @staticmethod
+    def placement_priority(pos_tile):
+        # Default priority of a candidate placement: longest segment in contact with the map boundary first, then closest to the center
+        return (-pos_tile.segment_length, pos_tile.l1_distance)
 
 
     def __len__(self):
@@ -492,7 +567,7 @@ class CandidateTiles:
     @staticmethod
     def to_be_deleted(pos_tile):
         # Ad hoc criteria to identify a tile to be deleted
-        return pos_tile.get_segment_length() == 0
+        return pos_tile.segment_length == 0
 
 
     def iterate(self):
@@ -507,10 +582,13 @@ class CandidateTiles:
             self.on_update(pos_tile)
         if self.to_be_deleted(pos_tile):
             self.delete(pos_tile.pos)
+        elif self.sort_key is not None:
+            self.__update_sorted(pos_tile)
         else:
             if pos_tile.pos not in self.tiles:
-                if pos_tile.pos not in self.sorted_positions:
+                if pos_tile.pos not in self.positions_set:
                     self.sorted_positions.append(pos_tile.pos)
+                    self.positions_set.add(pos_tile.pos)
                 else:
                     # We are restoring a deleted entry
                     assert self.nb_to_be_deleted > 0
@@ -518,12 +596,48 @@ class CandidateTiles:
             self.tiles[pos_tile.pos] = pos_tile
 
 
+    def __update_sorted(self, pos_tile):
+        # Incremental update of the ordered list of positions: O(log n) search plus one insertion/removal
+        pos = pos_tile.pos
+        key = self.sort_key(pos_tile)
+        if pos in self.positions_set:
+            old_key = self.sort_keys[pos]
+            if old_key != key:
+                self.__remove_from_sorted(pos, old_key)
+                self.__insert_in_sorted(pos, key)
+        else:
+            self.positions_set.add(pos)
+            self.__insert_in_sorted(pos, key)
+        self.tiles[pos] = pos_tile
+
+
+    def __insert_in_sorted(self, pos, key):
+        self.sort_keys[pos] = key
+        idx = bisect.bisect_right(self.sorted_keys, key)
+        self.sorted_keys.insert(idx, key)
+        self.sorted_positions.insert(idx, pos)
+
+
+    def __remove_from_sorted(self, pos, key):
+        idx = bisect.bisect_left(self.sorted_keys, key)
+        while self.sorted_positions[idx] != pos:
+            idx += 1
+        del self.sorted_positions[idx]
+        del self.sorted_keys[idx]
+
+
     def delete(self, pos):
         assert isinstance(pos, Vect)
         if self.on_delete:
             self.on_delete(pos)
         if pos in self.tiles:
-            self.nb_to_be_deleted += 1
+            if self.sort_key is not None:
+                # No tombstone in the incremental mode: remove the entry right away
+                self.__remove_from_sorted(pos, self.sort_keys[pos])
+                del self.sort_keys[pos]
+                self.positions_set.discard(pos)
+            else:
+                self.nb_to_be_deleted += 1
             del self.tiles[pos]
 
 
@@ -531,6 +645,7 @@ class CandidateTiles:
         assert self.allocated() == len(self) + self.nb_to_be_deleted
         assert all(self.sorted_positions[idx] not in self.tiles for idx in range(len(self), self.allocated()))
         del self.sorted_positions[len(self):]
+        self.positions_set = set(self.sorted_positions)
         self.nb_to_be_deleted = 0
         assert self.allocated() == len(self) + self.nb_to_be_deleted
 
@@ -558,6 +673,16 @@ class CandidateTiles:
             self.__resize()
 
 
+    def sort_composite(self, key):
+        """Single sorting pass on a key function returning a tuple. Positions marked for deletion are pushed to the end"""
+        keys = dict((pos, key(pos_tile)) for (pos, pos_tile) in self.tiles.items())
+        sentinel = (sys.maxsize,)
+        self.sorted_positions.sort(key = lambda pos: keys.get(pos, sentinel))
+        # Resize if the nb of tiles marked for deletion is passed a certain threshold
+        if len(self) > 0 and (self.allocated() / len(self)) > 1.333:
+            self.__resize()
+
+
     def debug_printout(self):
         print('Candidates: (used/total: {}/{})'.format(len(self.tiles), len(self.sorted_positions)))
         for pos in self.sorted_positions:
@@ -569,13 +694,14 @@ class CandidateTiles:
 
 def validate_tile_placement(placed_tile, border):
     # Trivial except for river tiles
-    if 'R' in Boundary.label_getter(placed_tile.iter_segment()):
-        test_border = border.copy()
-        test_border.merge(placed_tile.get_boundary())
-        for (point, edge, label) in placed_tile.iter_complement_segment():
-            if label == 'R':
-                test_tile_border = boundary.from_edge(point, edge, Orientation.COUNTERCLOCKWISE, Domain.EXTERIOR)
-                common_segments = test_border.common_segments(test_tile_border)
+    if placed_tile.tile.river_label_count > 0 and placed_tile.segment_has_label('R'):
+        river_edges = [(point, edge) for (point, edge, label) in placed_tile.iter_complement_segment() if label == 'R']
+        if river_edges:
+            # The O(N) copy of the map boundary only happens when there are outgoing river edges to probe
+            test_border = border.copy()
+            test_border.merge(placed_tile.get_boundary())
+            tile_borders = [boundary.from_edge(point, edge, Orientation.COUNTERCLOCKWISE, Domain.EXTERIOR) for (point, edge) in river_edges]
+            for common_segments in test_border.common_segments_batch(tile_borders):
                 if len(common_segments) != 1:
                     return False
                 (_, _, L) = common_segments[0]
@@ -610,13 +736,14 @@ def update_border_and_candidate_tiles(placed_tile, border, candidate_tiles):
     candidate_tiles.delete(placed_tile.pos)
     neighbor_edges = [(point, edge) for (point, edge, _) in placed_tile.iter_complement_segment()]
     neighbor_edges.extend([(point + edge, edge) for (point, edge) in neighbor_edges[:-1]])
-    tiles_to_update = [PositionedTile.from_boundary_edge(border, point, edge) for (point, edge) in neighbor_edges]
+    tiles_to_update = PositionedTile.batch_from_boundary_edges(border, neighbor_edges)
     for pos_tile in tiles_to_update:
         candidate_tiles.update(pos_tile)
 
-    # Sort the updated list of candidates
-    candidate_tiles.sort(key=PlacedTile.get_l1_distance)
-    candidate_tiles.sort(key=PlacedTile.get_segment_length, reverse=True)
+    # Sort the updated list of candidates: by segment length in contact (longest first), then by L1 distance.
+    # Not needed when the container maintains the order incrementally.
+    if candidate_tiles.sort_key is None:
+        candidate_tiles.sort_composite(key = CandidateTiles.placement_priority)
     if DEBUG_PRINTOUT:
         candidate_tiles.debug_printout()
     return placed_tile
@@ -629,6 +756,28 @@ def select_tile_placement(candidate_placements):
     return candidate_placements[0]
 
 
+@functools.lru_cache(maxsize = None)
+def tile_prototype_boundary(desc):
+    """The boundary of a tile at the origin, computed once per distinct description"""
+    return boundary.get_tile(Vect.unit(0, 0), list(desc))
+
+
+@functools.lru_cache(maxsize = 8192)
+def matching_tile_rotations(contact_labels, desc, j):
+    """
+    Rotations of a tile description matching the given run of labels on the map boundary.
+    Same convention as Boundary.find_matching_rotations with the default label comparator.
+    Memoized: the space of short label runs over the few distinct labels is small, and the
+    same local patterns recur all along the map boundary.
+    """
+    labels_rev = list(contact_labels)
+    labels_rev.reverse()
+    L = len(labels_rev)
+    M = len(desc)
+    doubled = list(desc + desc)
+    return tuple(r for r in range(M) if doubled[(j - r) % M:(j - r) % M + L] == labels_rev)
+
+
 def find_candidate_placements(tile, border, candidate_tiles, max_candidates = -1, force_edge_label = None):
     assert isinstance(tile, Tile)
     assert isinstance(border, Boundary)
@@ -636,24 +785,26 @@ def find_candidate_placements(tile, border, candidate_tiles, max_candidates = -1
     assert isinstance(candidate_tiles, CandidateTiles)
     assert len(candidate_tiles) > 0
     candidate_placements = []
+    prototype_border = tile_prototype_boundary(tile.desc)
     for pos_tile in candidate_tiles.iterate():
         (i0, j0, L0) = pos_tile.get_segment()
         assert L0 > 0
-        tile_border = pos_tile.get_boundary(list(tile.desc))
+        tile_border = prototype_border.translated(pos_tile.pos)
         # Recompute PositionedTile because the common segment's 'i' index will not match
         pos_tile = PositionedTile(pos_tile.pos, border.common_segments(tile_border))
         (i1, j1, L1) = pos_tile.get_segment()
         if (j0, L0) != (j1, L1):
             warn('Incoherent common segments for tile at {} in candidate_tiles: {} and computed against the current border: {}'.format(pos_tile.pos, (i0, j0, L0), (i1, j1, L1)))
             continue
-        if force_edge_label is not None and force_edge_label not in Boundary.label_getter(border.iter_slice(i1, i1 + L1)):
+        if force_edge_label is not None and not border.has_label(force_edge_label, i1, L1):
             continue
-        for r in border.find_matching_rotations(tile_border, pos_tile.get_segment()):
+        contact_labels = tuple(border.labels[(i1 + k) % len(border)] for k in range(L1))
+        for r in matching_tile_rotations(contact_labels, tile.desc, j1):
             placed_tile = PlacedTile.from_positioned_tile(pos_tile, tile, r)
             if validate_tile_placement(placed_tile, border):
                 candidate_placements.append(placed_tile)
-        if max_candidates > 0 and len(candidate_placements) >= max_candidates:
-            break
+                if max_candidates > 0 and len(candidate_placements) >= max_candidates:
+                    return candidate_placements
     return candidate_placements
 
 
@@ -669,7 +820,7 @@ def place_carcassonne_city(tileset, candidate_tiles, display, z, pos, r = 0):
     composite_tile.draw(display, pos, r)
     display.update(z)
     border = composite_tile.get_boundary(pos, r)
-    neighbor_tiles = [PositionedTile.from_boundary_edge(border, point, edge) for (point, edge, _) in border.iter_all()]
+    neighbor_tiles = PositionedTile.batch_from_boundary_edges(border, [(point, edge) for (point, edge, _) in border.iter_all()])
     for pos_tile in neighbor_tiles:
         candidate_tiles.update(pos_tile)
     return border
@@ -718,7 +869,7 @@ def main():
     random.seed(rng_seed)
 
     # Load tileset (JSON files)
-    tileset = list(itertools.chain.from_iterable(parse_tileset_description_file(json_file) for json_file in args.files))
+    tileset = deduplicate_tileset(itertools.chain.from_iterable(parse_tileset_description_file(json_file) for json_file in args.files))
     if len(tileset) == 0:
         error('No tiles loaded')
 
@@ -750,13 +901,14 @@ def main():
 
         # Open display
         (w, h) = (0, 0) if args.full_screen else (1280, 720)
-        display = graphics.GridDisplay(w, h, tile_size)
+        display = graphics.GridDisplay(w, h, tile_size, debug = args.debug_mode)
         print('Press ESCAPE in the graphics window to quit', flush = True)
 
         # Place random tiles. The map must grow!
         candidate_tiles = CandidateTiles(
             on_update = lambda pos_tile: display.set_tile(segment_length_tiles[pos_tile.get_segment_length()].img, pos_tile.pos.x, pos_tile.pos.y) if args.debug_mode else None,
-            on_delete = None)
+            on_delete = None,
+            sort_key = CandidateTiles.placement_priority)
         z = args.zoom_factor
         border = place_carcassonne_city(carcassonne_city_tileset, candidate_tiles, display, z, Vect(-2, -1)) if city_start_flag else Boundary()
         total_nb_tiles_placed = 0
@@ -766,6 +918,7 @@ def main():
         for tileset in iterate_tilesets(river_tileset, regular_tileset, river_tileset_period, infinite = (args.max_tiles > 0)):
             for tiles_to_place in shuffle_tileset(tileset, first_tileset_flag, river_placement_policies):
                 local_nb_tiles_placed = 0
+                pending_draws = []          # Placed tile draws, accumulated and blitted in one batch per tiles subset
                 while len(tiles_to_place) > 0:
                     tiles_not_placed = []
                     for tile in tiles_to_place:
@@ -774,7 +927,7 @@ def main():
                             break
                         if len(border) == 0:
                             # The first tile of the map is placed at the center
-                            placed_tile = PlacedTile(tile, Vect(0, 0), r = 0)
+                            placed_tile = PlacedTile(tile, Vect.unit(0, 0), r = 0)
                         else:
                             forced_segment = 'R' if 'river' in tile.tags and 'source' not in tile.tags else None
                             max_candidates = 1
@@ -782,7 +935,7 @@ def main():
                             placed_tile = select_tile_placement(candidate_placements) if len(candidate_placements) > 0 else None
                         if placed_tile:
                             update_border_and_candidate_tiles(placed_tile, border, candidate_tiles)
-                            placed_tile.draw(display)
+                            pending_draws.append((placed_tile.tile.img, placed_tile.pos.x, placed_tile.pos.y, placed_tile.r))
                             total_nb_tiles_placed += 1
                             local_nb_tiles_placed += 1
                             # z = 0.995 * z
@@ -802,6 +955,7 @@ def main():
                     tiles_to_place = tiles_not_placed
 
                 # Done with the current tiles subset
+                display.draw_tiles(pending_draws)
                 if DEBUG_PRINTOUT or args.debug_mode:
                     print('total_nb_tiles_placed: {} (+{})'.format(total_nb_tiles_placed, local_nb_tiles_placed))
                 if all_done_flag:
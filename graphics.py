@@ -1,3 +1,4 @@
+import concurrent.futures
 import os
 import sys
 from collections import defaultdict
@@ -15,6 +16,7 @@ TILE_COLORS = {
     'R': pygame.Color(0,   0,   200),       # River
 }
 UNKNOWN_DESC_COLOR = pygame.Color(255, 0, 0)
+BLACK = pygame.Color(0, 0, 0)
 
 
 def init():
@@ -76,12 +78,21 @@ def path_polygon(x0, y0, x1, y1, xc, yc, width_percent):
     ]
 
 
+def _display_format(tile):
+    # Convert to the display pixel format right away when a display exists, so that
+    # every subsequent transform and blit skips the per-pixel format conversion
+    return tile.convert() if pygame.display.get_surface() is not None else tile
+
+
 def draw_uniform_tile(color, size):
     (r, g, b) = color
     assert is_init()
     tile = pygame.Surface((size, size))
     tile.fill(pygame.Color(r, g, b))
-    return Image(tile)
+    return Image(_display_format(tile))
+
+
+_GAME_TILE_CACHE = {}       # (desc, size) -> Image. The drawn surfaces are never mutated, so they are shared
 
 
 def draw_game_tile(desc, size):
@@ -91,6 +102,9 @@ def draw_game_tile(desc, size):
     """
     assert is_init()
     assert len(desc) == 4               # A tile has four sides
+    key = (tuple(desc), size)
+    if key in _GAME_TILE_CACHE:
+        return _GAME_TILE_CACHE[key]
     tile = pygame.Surface((size, size))
     rect = tile.get_rect()
     tile.fill(TILE_COLORS['F'])
@@ -100,7 +114,7 @@ def draw_game_tile(desc, size):
         x0, y0 = corners[idx % 4]
         x1, y1 = corners[(idx + 1) % 4]
         xc, yc = rect.center
-        if quarter_desc == 'T' or quarter_desc not in TILE_COLORS.keys():
+        if quarter_desc == 'T' or quarter_desc not in TILE_COLORS:
             polygon = [
                 (x0, y0),
                 (xc, yc),
@@ -112,11 +126,13 @@ def draw_game_tile(desc, size):
             polygon = path_polygon(x0, y0, x1, y1, xc, yc, 15)
         else:
             polygon = []
-        color = TILE_COLORS[quarter_desc] if quarter_desc in TILE_COLORS.keys() else UNKNOWN_DESC_COLOR
+        color = TILE_COLORS[quarter_desc] if quarter_desc in TILE_COLORS else UNKNOWN_DESC_COLOR
         if len(polygon) > 0:
             pygame.draw.polygon(tile, color, polygon)
         idx = idx + 1
-    return Image(tile)
+    image = Image(_display_format(tile))
+    _GAME_TILE_CACHE[key] = image
+    return image
 
 
 class MustQuit(Exception):
@@ -128,7 +144,7 @@ def format_32bit_flag(i):
 
 
 class GridDisplay:
-    def __init__(self, w, h, tile_size):
+    def __init__(self, w, h, tile_size, debug = False):
         if not is_init():
             raise RuntimeError('Call graphics.init() prior to instantiating the grid display')
         if (w, h) == (0, 0):
@@ -138,6 +154,7 @@ class GridDisplay:
         assert tile_size > 0
         self.tile_size = tile_size
         self.current_zoom = 0.0
+        self.debug = debug          # The per-call counters and infos below are only maintained in debug mode
         self.tiles = {}
         self.bottomleft = (0, 0)
         self.topright = (0, 0)
@@ -148,27 +165,53 @@ class GridDisplay:
         self.dbg_info['display_bitsize'] = self.screen.get_bitsize()
         self.dbg_info['display_height'] = self.screen.get_height()
         self.dbg_info['display_width'] = self.screen.get_width()
+        self.rotated_imgs = {}      # (Image, r) -> rotated surface, there are at most 4 rotations per image
+        self.scaled_imgs = {}       # (rotated surface, target size) -> scaled surface, cleared on zoom change
+        self.black_tile = None
+        self.dirty_rects = []       # Screen regions touched since the last display update
         self.dbg_info['tile_size'] = self.tile_size
         self.dbg_info['current_zoom'] = self.current_zoom
 
 
+    def __rotated_img(self, image, r):
+        r = r & 3
+        if r == 0:
+            # No rotation: pygame.transform.rotate would still copy the surface
+            return image.converted_img()
+        key = (image, r)
+        rotated_img = self.rotated_imgs.get(key)
+        if rotated_img is None:
+            rotated_img = pygame.transform.rotate(image.converted_img(), r * 90)
+            self.rotated_imgs[key] = rotated_img
+        return rotated_img
+
+
+    def __scaled_img(self, rotated_img, target_size):
+        if target_size == rotated_img.get_width() == rotated_img.get_height():
+            # Zoom 1.0: the source surface is already at the target size
+            return rotated_img
+        key = (rotated_img, target_size)
+        scaled_img = self.scaled_imgs.get(key)
+        if scaled_img is None:
+            scaled_img = pygame.transform.smoothscale(rotated_img, (target_size, target_size))
+            self.scaled_imgs[key] = scaled_img
+        return scaled_img
+
+
+    def __compute_blit(self, rotated_img, i, j, target_size):
+        scaled_img = self.__scaled_img(rotated_img, target_size)
+        pos = scaled_img.get_rect().move(self.center).move((-0.5 + i) * target_size, (-0.5 - j) * target_size).topleft
+        return (scaled_img, pos)
+
+
     def __blit(self, rotated_img, i, j):
-        self.dbg_counters['calls_to___blit'] += 1
+        if self.debug:
+            self.dbg_counters['calls_to___blit'] += 1
         target_size = round(self.tile_size * self.current_zoom)
-        scaled_img = pygame.transform.smoothscale(rotated_img, (target_size, target_size))
-        pos = scaled_img.get_rect().move(self.center).move((-0.5 + i) * target_size, (-0.5 - j) * target_size).topleft
-        self.screen.blit(scaled_img, pos)
+        self.dirty_rects.append(self.screen.blit(*self.__compute_blit(rotated_img, i, j, target_size)))
 
 
-    def set_tile(self, image, i, j, r = 0):
-        assert isinstance(image, Image)
-        self.dbg_counters['calls_to_set_tile'] += 1
-        self.dbg_info['last_set_tile'] = repr((i, j, r))
-        assert image.height() == self.tile_size
-        assert image.width() == self.tile_size
-        rotated_img = pygame.transform.rotate(image.converted_img(), r * 90)
-        self.tiles[(i, j)] = rotated_img
-        self.__blit(rotated_img, i, j)
+    def __update_grid_bounds(self, i, j):
         if i < self.bottomleft[0]:
             self.bottomleft = (i, self.bottomleft[1])
         elif i > self.topright[0]:
@@ -179,38 +222,87 @@ class GridDisplay:
             self.topright = (self.topright[0], j)
 
 
+    def set_tile(self, image, i, j, r = 0):
+        assert isinstance(image, Image)
+        if self.debug:
+            self.dbg_counters['calls_to_set_tile'] += 1
+            self.dbg_info['last_set_tile'] = repr((i, j, r))
+        assert image.height() == self.tile_size
+        assert image.width() == self.tile_size
+        rotated_img = self.__rotated_img(image, r)
+        self.tiles[(i, j)] = rotated_img
+        self.__blit(rotated_img, i, j)
+        self.__update_grid_bounds(i, j)
+
+
+    def draw_tiles(self, tiles):
+        """Set a batch of tiles given as (image, i, j, r) entries, blitted to the screen in a single pygame call"""
+        if self.debug:
+            self.dbg_counters['calls_to_draw_tiles'] += 1
+        target_size = round(self.tile_size * self.current_zoom)
+        blit_sequence = []
+        for (image, i, j, r) in tiles:
+            assert isinstance(image, Image)
+            assert image.height() == self.tile_size
+            assert image.width() == self.tile_size
+            rotated_img = self.__rotated_img(image, r)
+            self.tiles[(i, j)] = rotated_img
+            blit_sequence.append(self.__compute_blit(rotated_img, i, j, target_size))
+            self.__update_grid_bounds(i, j)
+        self.dirty_rects.extend(self.screen.blits(blit_sequence))
+
+
     def reset_tile(self, i, j):
-        self.dbg_counters['calls_to_reset_tile'] += 1
-        self.dbg_info['last_reset_tile'] = repr((i, j, 0))
+        if self.debug:
+            self.dbg_counters['calls_to_reset_tile'] += 1
+            self.dbg_info['last_reset_tile'] = repr((i, j, 0))
         del self.tiles[(i, j)]
-        black_tile = pygame.Surface((self.tile_size, self.tile_size))
-        black_tile.fill(pygame.Color(0, 0, 0))
-        self.__blit(black_tile, i, j)
+        if self.black_tile is None:
+            self.black_tile = pygame.Surface((self.tile_size, self.tile_size)).convert()
+            self.black_tile.fill(BLACK)
+        self.__blit(self.black_tile, i, j)
 
 
     def check_event_queue(self, wait_ms = 0):
-        self.dbg_counters['calls_to_check_event_queue'] += 1
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                raise MustQuit()
-            elif event.type == pygame.KEYUP and event.key == pygame.K_ESCAPE:
+        if self.debug:
+            self.dbg_counters['calls_to_check_event_queue'] += 1
+        # Only QUIT and KEYUP matter here: pump the queue and fetch just those, instead of
+        # building a Python object for every queued event (mouse motion in particular)
+        pygame.event.pump()
+        if pygame.event.peek(pygame.QUIT):
+            raise MustQuit()
+        for event in pygame.event.get(pygame.KEYUP):
+            if event.key == pygame.K_ESCAPE:
                 raise MustQuit()
-            else:
-                pass
+        pygame.event.clear()
         if wait_ms > 0:
             pygame.time.wait(wait_ms)
 
 
     def update(self, zoom = 1.0, wait_ms = 0):
-        self.dbg_counters['calls_to_update'] += 1
+        if self.debug:
+            self.dbg_counters['calls_to_update'] += 1
         assert zoom > 0.0
         if zoom != self.current_zoom:
-            self.screen.fill(pygame.Color(0, 0, 0))
+            self.scaled_imgs.clear()
+            self.screen.fill(BLACK)
             self.current_zoom = zoom
             self.dbg_info['current_zoom'] = self.current_zoom
-            for coord, img in self.tiles.items():
-                self.__blit(img, coord[0], coord[1])
-        pygame.display.flip()
+            target_size = round(self.tile_size * self.current_zoom)
+            if target_size != self.tile_size:
+                # Rescale the distinct surfaces in parallel (smoothscale releases the GIL),
+                # the blits below then run on this thread against a warm cache
+                distinct_imgs = list(set(self.tiles.values()))
+                with concurrent.futures.ThreadPoolExecutor() as executor:
+                    scaled = executor.map(lambda img: pygame.transform.smoothscale(img, (target_size, target_size)), distinct_imgs)
+                    self.scaled_imgs.update(((img, target_size), scaled_img) for (img, scaled_img) in zip(distinct_imgs, scaled))
+            # Full redraw in one batched blits call
+            self.screen.blits([self.__compute_blit(img, coord[0], coord[1], target_size) for (coord, img) in self.tiles.items()], doreturn = False)
+            pygame.display.flip()
+        else:
+            # Zoom unchanged: only swap the regions touched since the last update
+            pygame.display.update(self.dirty_rects)
+        self.dirty_rects.clear()
         self.check_event_queue(wait_ms)
 
 
@@ -237,7 +329,7 @@ class GridDisplay:
         height = 1 + self.topright[1] - self.bottomleft[1]
         target_tile_size = round(scale * self.tile_size)
         dump_surf = pygame.Surface((width * target_tile_size, height * target_tile_size))
-        dump_surf.fill(pygame.Color(0, 0, 0))
+        dump_surf.fill(BLACK)
         for coord, img in self.tiles.items():
             topleft = (target_tile_size * (coord[0] - self.bottomleft[0]), target_tile_size * (self.topright[1] - coord[1]))
             scaled_img = pygame.transform.smoothscale(img, (target_tile_size, target_tile_size))
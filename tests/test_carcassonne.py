@@ -70,6 +70,26 @@ class TestCandidateTiles(unittest.TestCase):
         self.assertEqual([tile.pos for tile in self.candidates.iterate()], [Vect(0, 0), Vect(2, 2), Vect(3, 3), Vect(4, 4)])
 
 
+    def test_incremental_sort_key(self):
+        candidates = CandidateTiles(sort_key = CandidateTiles.placement_priority)
+        candidates.update(PositionedTile(Vect(4, 4), segments = [(0, 0, 1)]))
+        candidates.update(PositionedTile(Vect(3, 3), segments = [(0, 0, 1)]))
+        candidates.update(PositionedTile(Vect(2, 2), segments = [(0, 0, 2)]))
+        candidates.update(PositionedTile(Vect(1, 1), segments = [(0, 0, 2)]))
+        candidates.update(PositionedTile(Vect(0, 0), segments = [(0, 0, 3)]))
+        self.assertEqual(len(candidates), 5)
+        self.assertEqual([tile.pos for tile in candidates.iterate()], [Vect(0, 0), Vect(1, 1), Vect(2, 2), Vect(3, 3), Vect(4, 4)])
+        # Re-key an entry: it moves to its new rank without an explicit sort
+        candidates.update(PositionedTile(Vect(0, 0), segments = [(0, 0, 1)]))
+        self.assertEqual([tile.pos for tile in candidates.iterate()], [Vect(1, 1), Vect(2, 2), Vect(0, 0), Vect(3, 3), Vect(4, 4)])
+        # Deletion is immediate in this mode, no tombstone
+        candidates.delete(Vect(2, 2))
+        self.assertEqual(len(candidates), 4)
+        self.assertEqual(candidates.nb_to_be_deleted, 0)
+        self.assertEqual(candidates.allocated(), 4)
+        self.assertEqual([tile.pos for tile in candidates.iterate()], [Vect(1, 1), Vect(0, 0), Vect(3, 3), Vect(4, 4)])
+
+
     def test_resize(self):
         self.do_sort()
         self.assertEqual(len(self.candidates), 5)